@@ -17,18 +17,117 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import argparse
-import json
 import os
-import re
-import subprocess
+import pwd
 import sys
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+
+_INHIBIT_COLUMNS = ('WHO', 'UID', 'USER', 'PID', 'COMM', 'WHAT', 'WHY', 'MODE')
+
+# sysfs subtrees that never host wakeup-capable devices (mostly per-CPU
+# attribute directories), pruned from the /sys/devices fallback walk
+_SYSFS_SKIP_DIRS = frozenset((
+    'cache',
+    'microcode',
+    'topology',
+    'cpufreq',
+    'cpuidle',
+    'thermal_throttle'
+))
+
+# Flags for opening sysfs directories during the fallback walk; O_NOFOLLOW
+# guarantees a symlink swapped in after listing is never descended into
+_SYSFS_DIR_FLAGS = os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW
+
+# ANSI color codes
+_COLORS_ON = types.SimpleNamespace(
+    reset='\033[0m',
+    bold='\033[1m',
+    header='\033[1;34m'  # Bold blue
+)
+_COLORS_OFF = types.SimpleNamespace(reset='', bold='', header='')
+
+# Decided once at import: stdout is a terminal that understands ANSI codes
+_COLOR_AVAILABLE = (
+    sys.stdout is not None
+    and sys.stdout.isatty()
+    and os.environ.get('TERM', '') != 'dumb'
+)
+
+
+def _process_comm(pid):
+    """Return the command name of a process, or '' if unavailable."""
+    try:
+        with open(f'/proc/{pid}/comm', 'r') as f:
+            return f.read().strip()
+    except (FileNotFoundError, PermissionError, IOError):
+        return ''
+
+
+def _user_name(uid):
+    """Return the user name for a uid, falling back to the numeric id."""
+    try:
+        return pwd.getpwuid(uid).pw_name
+    except KeyError:
+        return str(uid)
+
+
+def _dbus_inhibitors():
+    """Query logind's ListInhibitors over D-Bus. Returns list of dicts, or None."""
+    # jeepney is optional; without it (or without a system bus) the caller
+    # falls back to parsing systemd-inhibit --list.
+    try:
+        from jeepney import DBusAddress, new_method_call
+        from jeepney.io.blocking import open_dbus_connection
+        from jeepney.wrappers import DBusErrorResponse, unwrap_msg
+    except ImportError:
+        return None
+    
+    login1 = DBusAddress(
+        '/org/freedesktop/login1',
+        bus_name='org.freedesktop.login1',
+        interface='org.freedesktop.login1.Manager'
+    )
+    try:
+        with open_dbus_connection(bus='SYSTEM') as conn:
+            reply = conn.send_and_get_reply(
+                new_method_call(login1, 'ListInhibitors'),
+                timeout=5
+            )
+        rows = unwrap_msg(reply)[0]
+    except (OSError, ValueError, DBusErrorResponse):
+        return None
+    
+    # Each row is (what, who, why, mode, uid, pid)
+    inhibitors = []
+    for what, who, why, mode, uid, pid in rows:
+        inhibitors.append({
+            'who': who,
+            'uid': str(uid),
+            'user': _user_name(uid),
+            'pid': pid,
+            'comm': _process_comm(pid),
+            'what': what,
+            'why': why,
+            'mode': mode
+        })
+    return inhibitors
 
 
 def get_systemd_inhibitors(no_systemd=False):
-    """Query systemd inhibitors via systemd-inhibit --list. Returns list of dicts."""
+    """Query systemd inhibitors via D-Bus or systemd-inhibit --list. Returns list of dicts."""
     if no_systemd:
         return []
     
+    inhibitors = _dbus_inhibitors()
+    if inhibitors is not None:
+        return inhibitors
+    
+    # Only needed for the fallback; importing it costs noticeable startup time.
+    import subprocess
+    
     try:
         result = subprocess.run(
             ['systemd-inhibit', '--list'],
@@ -45,73 +144,42 @@ def get_systemd_inhibitors(no_systemd=False):
         if len(lines) < 2:
             return inhibitors
         
-        # Parse header to find column positions
+        # Work out where each column starts from the header, once. systemd
+        # separates columns with a single space, so the widest cell of a
+        # column touches the next one and splitting on whitespace is unsafe.
+        # Format: WHO            UID USER PID  COMM          WHAT     WHY                                                                     MODE
         header = lines[0]
-        # Find positions of column headers (they are separated by 2+ spaces)
-        # Format: WHO            UID  USER  PID  COMM          WHAT     WHY                                                                     MODE
-        header_parts = re.split(r'\s{2,}', header.strip())
-        
-        # Try to find column boundaries by looking for the headers
         col_starts = []
-        col_names = ['WHO', 'UID', 'USER', 'PID', 'COMM', 'WHAT', 'WHY', 'MODE']
-        for col_name in col_names:
-            pos = header.find(col_name)
-            if pos >= 0:
-                col_starts.append((col_name, pos))
+        pos = 0
+        for col_name in _INHIBIT_COLUMNS:
+            pos = header.find(col_name, pos)
+            if pos < 0:
+                return inhibitors
+            col_starts.append(pos)
+            pos += len(col_name)
         
         # Parse data lines
         for line in lines[1:]:
-            line = line.rstrip('\n')
+            # A blank line separates the table from the "N inhibitors listed." footer
             if not line.strip():
-                continue
+                break
             
-            # If we found column positions, use them
-            if col_starts:
-                def get_field(start_idx, end_idx=None):
-                    if end_idx is None:
-                        end_idx = len(line)
-                    start_pos = col_starts[start_idx][1] if start_idx < len(col_starts) else len(line)
-                    end_pos = col_starts[start_idx + 1][1] if start_idx + 1 < len(col_starts) else len(line)
-                    return line[start_pos:end_pos].strip()
-                
-                try:
-                    who = get_field(0, 1) if len(col_starts) > 0 else ''
-                    uid = get_field(1, 2) if len(col_starts) > 1 else ''
-                    user = get_field(2, 3) if len(col_starts) > 2 else ''
-                    pid_str = get_field(3, 4) if len(col_starts) > 3 else ''
-                    pid = int(pid_str) if pid_str and pid_str.isdigit() else None
-                    comm = get_field(4, 5) if len(col_starts) > 4 else ''
-                    what = get_field(5, 6) if len(col_starts) > 5 else ''
-                    why = get_field(6, 7) if len(col_starts) > 6 else ''
-                    mode = get_field(7) if len(col_starts) > 7 else ''
-                except IndexError:
-                    # Fallback to simple splitting
-                    parts = re.split(r'\s{2,}', line.strip())
-                    if len(parts) >= 8:
-                        who = parts[0]
-                        uid = parts[1]
-                        user = parts[2]
-                        pid = int(parts[3]) if parts[3].isdigit() else None
-                        comm = parts[4]
-                        what = parts[5]
-                        why = ' '.join(parts[6:-1])
-                        mode = parts[-1]
-                    else:
-                        continue
-            else:
-                # Fallback: split on 2+ spaces
-                parts = re.split(r'\s{2,}', line.strip())
-                if len(parts) >= 8:
-                    who = parts[0]
-                    uid = parts[1]
-                    user = parts[2]
-                    pid = parts[3] if parts[3].isdigit() else None
-                    comm = parts[4]
-                    what = parts[5]
-                    why = ' '.join(parts[6:-1])
-                    mode = parts[-1]
-                else:
-                    continue
+            # Right-aligned columns (UID, PID) can hold cells wider than
+            # their header, which then start left of it: back up to the
+            # separating space.
+            starts = []
+            for start in col_starts:
+                while 0 < start <= len(line) and line[start - 1] != ' ':
+                    start -= 1
+                starts.append(start)
+            who, uid, user, pid_str, comm, what, why, mode = [
+                line[start:end].strip()
+                for start, end in zip(starts, starts[1:] + [None])
+            ]
+            try:
+                pid = int(pid_str)
+            except ValueError:
+                pid = None
             
             inhibitors.append({
                 'who': who,
@@ -135,107 +203,222 @@ def parse_wakeup_devices():
     devices = {}
     
     try:
-        with open(wakeup_file, 'r') as f:
-            lines = f.readlines()
+        # Read procfs in one syscall into a fixed 8K buffer, bypassing the
+        # io stack; only keep reading if the buffer came back full.
+        fd = os.open(wakeup_file, os.O_RDONLY)
+        try:
+            chunks = [os.read(fd, 8192)]
+            while len(chunks[-1]) == 8192:
+                chunks.append(os.read(fd, 8192))
+        finally:
+            os.close(fd)
+        data = b''.join(chunks)
         
-        for line in lines:
-            line = line.strip()
-            if not line or line.startswith('Device'):
+        # Work on the raw bytes and only decode the fields that end up in
+        # the result; rows without a status (e.g. extra physical node
+        # lines) and the header are skipped before any decoding.
+        for line in data.splitlines():
+            if not line or line.startswith(b'Device'):
                 continue
             
-            parts = line.split()
-            if len(parts) >= 3:
-                device_name = parts[0]
-                status_str = parts[2] if len(parts) > 2 else ''
-                sysfs_node = ' '.join(parts[3:]) if len(parts) > 3 else ''
-                
-                # Status format: *enabled or *disabled
-                if status_str.startswith('*'):
-                    status = status_str[1:]  # Remove *
-                    devices[device_name] = {
-                        'status': status,
-                        'sysfs': sysfs_node
-                    }
-                elif status_str in ('enabled', 'disabled'):
-                    devices[device_name] = {
-                        'status': status_str,
-                        'sysfs': sysfs_node
-                    }
+            parts = line.split(None, 3)
+            if len(parts) < 3:
+                continue
+            
+            # Status format: *enabled or *disabled
+            status = parts[2]
+            if status.startswith(b'*'):
+                status = status[1:]  # Remove *
+            elif status not in (b'enabled', b'disabled'):
+                continue
+            
+            sysfs_node = parts[3].strip() if len(parts) > 3 else b''
+            devices[parts[0].decode('ascii', 'replace')] = {
+                'status': status.decode('ascii', 'replace'),
+                'sysfs': sysfs_node.decode('ascii', 'replace')
+            }
         
         return devices
     except (FileNotFoundError, PermissionError, IOError):
         return {}
 
 
-def check_sys_wakeup_devices():
-    """Check /sys for wakeup-capable devices. Returns list."""
+def _wakeup_entry(device_path, status):
+    """Build a wake source dict from raw power/wakeup bytes, or None."""
+    status = status.rstrip()
+    if status and status != b'disabled':
+        # Get device name from path
+        return {
+            'device': os.path.basename(device_path),
+            'status': status.decode('ascii', 'replace'),
+            'path': device_path
+        }
+    return None
+
+
+def _read_wakeup(device_path):
+    """Read power/wakeup for a sysfs device. Returns dict or None."""
+    # No exists() probe: a missing file just means the device can't wake.
+    # The field is short ASCII, so compare bytes rather than decoding.
+    try:
+        with open(os.path.join(device_path, 'power', 'wakeup'), 'rb') as f:
+            status = f.read()
+    except (FileNotFoundError, PermissionError, IOError):
+        return None
+    return _wakeup_entry(device_path, status)
+
+
+def _walk_sys_dir(fd, path, wakeup_devices):
+    """Collect wake sources below an open sysfs directory fd, recursively."""
+    # Listing via the fd and is_dir(follow_symlinks=False) keeps the
+    # d_type from readdir, so the many symlinked directories in sysfs
+    # (subsystem/, driver/, device/, ...) are skipped without a stat().
+    try:
+        with os.scandir(fd) as it:
+            subdirs = [
+                entry.name for entry in it
+                if entry.is_dir(follow_symlinks=False)
+                and entry.name not in _SYSFS_SKIP_DIRS
+            ]
+    except (PermissionError, OSError):
+        return
+    
+    if 'power' in subdirs:
+        try:
+            wakeup_fd = os.open('power/wakeup', os.O_RDONLY, dir_fd=fd)
+        except (FileNotFoundError, PermissionError, OSError):
+            wakeup_fd = None
+        if wakeup_fd is not None:
+            try:
+                status = os.read(wakeup_fd, 32)
+            except OSError:
+                status = b''
+            finally:
+                os.close(wakeup_fd)
+            device = _wakeup_entry(path, status)
+            if device is not None:
+                wakeup_devices.append(device)
+    
+    for name in subdirs:
+        try:
+            child_fd = os.open(name, _SYSFS_DIR_FLAGS, dir_fd=fd)
+        except (PermissionError, OSError):
+            continue
+        try:
+            _walk_sys_dir(child_fd, os.path.join(path, name), wakeup_devices)
+        finally:
+            os.close(child_fd)
+
+
+def _walk_sys_devices():
+    """Walk /sys/devices for power/wakeup files. Returns list."""
+    # Every directory is opened relative to its parent's fd and
+    # power/wakeup relative to its own, so each open is an openat(2) of a
+    # single component instead of re-resolving the whole (often 8+
+    # component) sysfs path. Only the current path's fds are held open.
+    # glob's recursive '**' would follow symlinks into sysfs's cycles
+    # (driver/, subsystem/, device/), so it is not an option here.
     wakeup_devices = []
+    try:
+        fd = os.open('/sys/devices', os.O_RDONLY | os.O_DIRECTORY)
+    except (PermissionError, OSError):
+        # /sys/devices may be missing or unreadable (containers, chroots)
+        return wakeup_devices
+    try:
+        _walk_sys_dir(fd, '/sys/devices', wakeup_devices)
+    finally:
+        os.close(fd)
     
-    # Check /sys/devices/*/power/wakeup
-    sys_devices = '/sys/devices'
+    return wakeup_devices
+
+
+def _fast_wakeup_class():
+    """Return device paths listed in /sys/class/wakeup, or None if absent."""
+    # Every wakeup source registered by the kernel is listed in
+    # /sys/class/wakeup as a symlink to <device>/wakeup/wakeupN, so on
+    # modern kernels a single scandir replaces the full /sys/devices walk.
     try:
-        for root, dirs, files in os.walk(sys_devices):
-            wakeup_path = os.path.join(root, 'power', 'wakeup')
-            if os.path.exists(wakeup_path):
-                try:
-                    with open(wakeup_path, 'r') as f:
-                        status = f.read().strip()
-                    if status and status != 'disabled':
-                        # Get device name from path
-                        device_name = os.path.basename(root)
-                        wakeup_devices.append({
-                            'device': device_name,
-                            'status': status,
-                            'path': root
-                        })
-                except (PermissionError, IOError):
-                    continue
+        with os.scandir('/sys/class/wakeup') as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except FileNotFoundError:
+        return None
     except (PermissionError, OSError):
-        pass
+        return []
+    
+    # One readlink per entry gives "../../devices/.../<device>/wakeup/wakeupN";
+    # normalising it against the class directory is pure string work, unlike
+    # realpath() which lstat()s and readlink()s every path component.
+    # Sources without a parent device live under devices/virtual/wakeup and
+    # have no power/wakeup to read; a device with several sources is listed
+    # once.
+    candidates = []
+    seen = set()
+    for entry in entries:
+        try:
+            target = os.readlink(entry.path)
+        except OSError:
+            continue
+        target = os.path.normpath(os.path.join('/sys/class/wakeup', target))
+        source_dir = os.path.dirname(target)
+        if source_dir == '/sys/devices/virtual/wakeup':
+            continue
+        device_path = os.path.dirname(source_dir)
+        if device_path not in seen:
+            seen.add(device_path)
+            candidates.append(device_path)
+    return candidates
+
+
+def check_sys_wakeup_devices():
+    """Check /sys for wakeup-capable devices. Returns list."""
+    candidates = _fast_wakeup_class()
+    if candidates is None:
+        return _walk_sys_devices()
+    
+    wakeup_devices = []
+    
+    for device_path in candidates:
+        device = _read_wakeup(device_path)
+        if device is not None:
+            wakeup_devices.append(device)
     
     return wakeup_devices
 
 
 def format_human_readable(inhibitors, wake_sources, use_color=True):
-    """Format output for human consumption."""
-    output = []
-    
-    # ANSI color codes
-    if use_color:
-        reset = '\033[0m'
-        bold = '\033[1m'
-        header = '\033[1;34m'  # Bold blue
-    else:
-        reset = ''
-        bold = ''
-        header = ''
+    """Format output for human consumption. Yields lines."""
+    c = _COLORS_ON if use_color else _COLORS_OFF
     
     # Inhibitors section
-    output.append(f"{header}=== systemd Inhibitors ==={reset}")
+    yield '%s=== systemd Inhibitors ===%s' % (c.header, c.reset)
     if inhibitors:
-        output.append(f"{bold}These inhibitors currently block suspend:{reset}")
+        yield '%sThese inhibitors currently block suspend:%s' % (c.bold, c.reset)
         for inh in inhibitors:
-            pid_info = f"PID {inh.get('pid')}" if inh.get('pid') else ""
-            user_info = f"user: {inh.get('user', '')}" if inh.get('user') else ""
-            comm_info = f"({inh.get('comm', '')})" if inh.get('comm') else ""
+            pid = inh.get('pid')
+            user = inh.get('user', '')
+            comm = inh.get('comm', '')
+            who = inh.get('who', 'Unknown')
+            what = inh.get('what', '')
+            why = inh.get('why', '')
+            
+            pid_info = 'PID %s' % pid if pid else ''
+            user_info = 'user: %s' % user if user else ''
             info_parts = [p for p in [pid_info, user_info] if p]
-            info_str = f" ({', '.join(info_parts)})" if info_parts else ""
-            comm_str = f" {comm_info}" if comm_info else ""
-            output.append(f"  • {inh.get('who', 'Unknown')}{comm_str}{info_str}")
-            if inh.get('what') or inh.get('why'):
-                what = inh.get('what', '')
-                why = inh.get('why', '')
+            info_str = ' (%s)' % ', '.join(info_parts) if info_parts else ''
+            comm_str = ' (%s)' % comm if comm else ''
+            yield '  • %s%s%s' % (who, comm_str, info_str)
+            if what or why:
                 if why:
-                    output.append(f"    Reason: {what} ({why})")
+                    yield '    Reason: %s (%s)' % (what, why)
                 else:
-                    output.append(f"    Reason: {what}")
+                    yield '    Reason: %s' % what
     else:
-        output.append("No active inhibitors found.")
+        yield "No active inhibitors found."
     
-    output.append("")
+    yield ""
     
     # Wake sources section
-    output.append(f"{header}=== Wake Sources ==={reset}")
+    yield '%s=== Wake Sources ===%s' % (c.header, c.reset)
     enabled_wake_sources = []
     
     # From /proc/acpi/wakeup
@@ -249,27 +432,27 @@ def format_human_readable(inhibitors, wake_sources, use_color=True):
             enabled_wake_sources.append((dev.get('device', ''), dev.get('path', '')))
     
     if enabled_wake_sources:
-        output.append(f"{bold}These devices are configured as wake sources:{reset}")
+        yield '%sThese devices are configured as wake sources:%s' % (c.bold, c.reset)
         for device, path in enabled_wake_sources:
             if path:
-                output.append(f"  • {device} (enabled) - {path}")
+                yield '  • %s (enabled) - %s' % (device, path)
             else:
-                output.append(f"  • {device} (enabled)")
+                yield '  • %s (enabled)' % device
     else:
-        output.append("No wake-enabled devices found.")
+        yield "No wake-enabled devices found."
     
-    output.append("")
+    yield ""
     
     # Summary
-    output.append(f"{header}=== Summary ==={reset}")
-    output.append(f"Found {len(inhibitors)} active inhibitor(s) blocking suspend.")
-    output.append(f"Found {len(enabled_wake_sources)} wake-enabled device(s).")
-    
-    return '\n'.join(output)
+    yield '%s=== Summary ===%s' % (c.header, c.reset)
+    yield 'Found %d active inhibitor(s) blocking suspend.' % len(inhibitors)
+    yield 'Found %d wake-enabled device(s).' % len(enabled_wake_sources)
 
 
-def format_json(inhibitors, wake_sources, errors):
-    """Format output as JSON."""
+def format_json(inhibitors, wake_sources, errors, file=None):
+    """Write output as JSON to file (default: sys.stdout)."""
+    import json
+    
     # Combine wake sources
     combined_wake_sources = {}
     for device, info in wake_sources.get('proc_acpi', {}).items():
@@ -293,7 +476,10 @@ def format_json(inhibitors, wake_sources, errors):
         }
     }
     
-    return json.dumps(result, indent=2)
+    if file is None:
+        file = sys.stdout
+    json.dump(result, file, indent=2)
+    file.write('\n')
 
 
 def main():
@@ -322,24 +508,35 @@ def main():
     
     errors = []
     
-    # Collect inhibitors
-    inhibitors = get_systemd_inhibitors(no_systemd=args.no_systemd)
-    
-    # Collect wake sources
-    wake_sources = {}
-    wake_sources['proc_acpi'] = parse_wakeup_devices()
-    wake_sources['sys_devices'] = check_sys_wakeup_devices()
+    # The collectors are independent and mostly blocked on I/O, so run
+    # them concurrently: wall time is the slowest one, not the sum.
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        inhibitors_future = executor.submit(
+            get_systemd_inhibitors,
+            no_systemd=args.no_systemd
+        )
+        proc_acpi_future = executor.submit(parse_wakeup_devices)
+        sys_devices_future = executor.submit(check_sys_wakeup_devices)
+        
+        # Collect inhibitors
+        inhibitors = inhibitors_future.result()
+        
+        # Collect wake sources
+        wake_sources = {}
+        wake_sources['proc_acpi'] = proc_acpi_future.result()
+        wake_sources['sys_devices'] = sys_devices_future.result()
     
     # Output
     if args.json:
-        print(format_json(inhibitors, wake_sources, errors))
+        format_json(inhibitors, wake_sources, errors)
     else:
-        output = format_human_readable(
+        # Write lines as they are produced rather than joining them first
+        lines = format_human_readable(
             inhibitors,
             wake_sources,
-            use_color=not args.no_color and sys.stdout.isatty()
+            use_color=not args.no_color and _COLOR_AVAILABLE
         )
-        print(output)
+        sys.stdout.writelines(line + '\n' for line in lines)
 
 
 if __name__ == '__main__':